@@ -1,10 +1,11 @@
-import math
 import random
-from collections import defaultdict
-from typing import Dict, Hashable, List, Optional, Set
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set
+
+import numpy as np
 
 from knowledge_graph import Entity, KnowledgeGraph, Relation
-from utils import intersect, softmax
+from utils import get_anomaly_mask, warm_up_anomaly_mask
 
 
 class Symptom:
@@ -72,13 +73,42 @@ class Ayurveda:
         self.max_show_symptoms = max_show_symptoms
 
         self._kg = KnowledgeGraph.load_data(data_dir_path)
-        self._all_symptoms = self._kg.get_objects('diagnosis')
+        self._all_symptoms = list(self._kg.get_objects('diagnosis'))
         self._symptoms: Set[Symptom] = set()
+        # The described entities of `self._symptoms`, for filtering.
+        self._symptom_descriptions: Set[Entity] = set()
+        self._rng = random.Random()
         self._all_doshas = self._kg.get_objects('dosha')
         self._elevated_doshas: Set[Entity] = set()
 
+        # Doshas are indexed, so that scores can be accumulated in array.
+        self._doshas: List[Entity] = list(self._all_doshas)
+        self._dosha_ids: Dict[Entity, int] = {
+            dosha: i for i, dosha in enumerate(self._doshas)
+        }
+        symptom_to_doshas: Dict[Entity, List[Entity]] = defaultdict(list)
+        hints = self._kg.get_facts_by_relation(Relation('hints for elevation'))
+        for fact in hints:
+            symptom_to_doshas[fact.head].append(fact.tail)
+        self._symptom_to_dosha_ids: Dict[Entity, np.ndarray] = {
+            symptom: self._to_dosha_ids(doshas)
+            for symptom, doshas in symptom_to_doshas.items()
+        }
+
+        # The knowledge graph is static, so these are computed only once
+        # instead of in every interactive round.
+        self._all_positions = sorted(self._get_all_positions())
+        self._symptoms_by_position: Dict[str, List[Entity]] = {
+            position: list(self._kg.get_objects(position))
+            for position in self._all_positions
+        }
+
+        # So that the first round of diagnosis will not pay for compiling.
+        warm_up_anomaly_mask()
+
     def clean_symptoms(self):
         self._symptoms = set()
+        self._symptom_descriptions = set()
 
     def update_symptoms(self):
         with DataCollector() as collector:
@@ -102,31 +132,45 @@ class Ayurveda:
     def _update_symptoms_by_selection(self, collector: DataCollector):
         # Select position.
         msg = 'Select the position of your symptom:'
-        all_positions = sorted(self._get_all_positions())
-        position = collector.select(msg, all_positions)
+        position = collector.select(msg, self._all_positions)
 
         # Get all symptoms for that position.
         if position:
-            all_symptoms = self._kg.get_objects(position)
+            all_symptoms = self._symptoms_by_position[position]
         else:
             all_symptoms = self._all_symptoms
 
         # Display symptoms and get scores.
         msg = 'Rate the symptoms (1~5):'
-        show_symptoms = [
-            symptom for symptom in all_symptoms
-            if symptom not in self._symptoms
-        ]
-        if len(show_symptoms) > self.max_show_symptoms:
-            random.shuffle(show_symptoms)
-            num_show = min(len(show_symptoms), self.max_show_symptoms)
-            show_symptoms = show_symptoms[:num_show]
+        show_symptoms = self._sample_unrated_symptoms(
+            all_symptoms, self.max_show_symptoms)
         scores = collector.rate(msg, show_symptoms)
 
         # Update self._symptoms.
         for symptom, score in zip(show_symptoms, scores):
             position = self._get_position(symptom)
             self._symptoms.add(Symptom(str(position), str(symptom), score))
+            self._symptom_descriptions.add(symptom)
+
+    def _sample_unrated_symptoms(self, symptoms: List[Entity], k: int):
+        """Randomly draws at most `k` symptoms that have not been rated.
+
+        By rejection sampling, only about `k` probes are needed when most
+        of the `symptoms` are unrated, instead of filtering all of them.
+        """
+        randrange = self._rng.randrange
+        rated = self._symptom_descriptions
+        n = len(symptoms)
+        tried: Set[int] = set()
+        sampled: List[Entity] = []
+        while len(sampled) < k and len(tried) < n:
+            i = randrange(n)
+            if i in tried:
+                continue
+            tried.add(i)
+            if symptoms[i] not in rated:
+                sampled.append(symptoms[i])
+        return sampled
 
     def _get_all_positions(self):
         facts = self._kg.exact_search(
@@ -140,27 +184,49 @@ class Ayurveda:
         return all_positions
 
     def _get_position(self, symptom: str):
-        facts = self._kg.exact_search(
+        positions = self._kg.get_tails(
             head=symptom,
             relation=KnowledgeGraph.SUBCATEGORY_RELATION,
         )
-        for fact in facts:
-            return str(fact.tail)
+        for position in positions:
+            return str(position)
         raise ValueError(f'Cannot find position for symptom {symptom}')
 
     def diagnose(self, prob_threshold: float = 0.5) -> None:
-        dosha_scores = {dosha: 0 for dosha in self._all_doshas}
-        for symptom in self._symptoms:
-            facts = self._kg.fuzzy_search(
-                head=Entity(symptom.description),
-                relation=Relation('hints for elevation'),
-            )
-            for fact in facts:
-                dosha = fact.tail
-                dosha_scores[dosha] += symptom.score
+        symptoms = list(self._symptoms)
+        dosha_ids = [
+            self._get_dosha_ids(Entity(symptom.description))
+            for symptom in symptoms
+        ]
+        if dosha_ids:
+            indices = np.concatenate(dosha_ids)
+        else:
+            indices = np.zeros(0, dtype=np.intp)
+        weights = np.repeat(
+            np.array([symptom.score for symptom in symptoms],
+                     dtype=np.float64),
+            [len(ids) for ids in dosha_ids],
+        )
+        dosha_scores = np.bincount(indices,
+                                   weights=weights,
+                                   minlength=len(self._doshas))
         self._elevated_doshas = set(
-            get_anomalies(dosha_scores, prob_threshold)
+            _get_anomalies(self._doshas, dosha_scores, prob_threshold)
+        )
+
+    def _get_dosha_ids(self, description: Entity) -> np.ndarray:
+        if description in self._symptom_to_dosha_ids:
+            return self._symptom_to_dosha_ids[description]
+        # Novel description, thus fall back to fuzzy search.
+        facts = self._kg.fuzzy_search(
+            head=description,
+            relation=Relation('hints for elevation'),
         )
+        return self._to_dosha_ids([fact.tail for fact in facts])
+
+    def _to_dosha_ids(self, doshas: List[Entity]) -> np.ndarray:
+        return np.array([self._dosha_ids[dosha] for dosha in doshas],
+                        dtype=np.intp)
 
     @property
     def elevated_doshas(self):
@@ -170,43 +236,43 @@ class Ayurveda:
         if not self._elevated_doshas:
             return set()
 
-        food_for_doshas = []
+        all_food = self._kg.get_objects('food')
+        # Count for each food the number of doshas it pacifies, instead
+        # of intersecting the food sets of the doshas.
+        counter: Counter = Counter()
+        num_doshas = 0
         for dosha in self._elevated_doshas:
-            food = self._suggest_food_for_dosha(dosha)
-            if food:
-                food_for_doshas.append(food)
-        return intersect(*food_for_doshas)
+            food = self._suggest_food_for_dosha(dosha, all_food)
+            # Doshas that no food pacifies are not taken into account.
+            if not food:
+                continue
+            num_doshas += 1
+            counter.update(food)
+        return {food for food, count in counter.items() if count == num_doshas}
 
-    def _suggest_food_for_dosha(self, dosha: Entity):
-        all_food = self._kg.get_objects('food')
-        food_for_dosha: Set[Entity] = set()
-        pacifies = Relation('pacifies')
-        for fact in self._kg.facts:
-            if (
-                fact.head in all_food and
-                fact.relation.is_like(pacifies) and
-                fact.tail.is_like(dosha)
-            ):
-                food_for_dosha.add(fact.head)
-        return food_for_dosha
+    def _suggest_food_for_dosha(self,
+                                dosha: Entity,
+                                all_food: FrozenSet[Entity]):
+        return self._kg.find_heads(Relation('pacifies'), [dosha],
+                                   heads=all_food)
 
 
 def get_anomalies(item_scores: Dict[Hashable, float],
                   prob_threshold: float):
-    items = list(item_scores)
+    scores = np.fromiter(item_scores.values(),
+                         dtype=np.float64,
+                         count=len(item_scores))
+    return _get_anomalies(list(item_scores), scores, prob_threshold)
 
-    log_scores = []
-    for item in items:
-        score = item_scores[item]
-        assert score >= 0
-        log_scores.append(math.log(score + 1e-1))
 
-    probs = softmax(log_scores)
+def _get_anomalies(items: List[Hashable],
+                   scores: np.ndarray,
+                   prob_threshold: float):
+    assert np.all(scores >= 0)
 
-    anomalies = {}
-    for item, prob in zip(items, probs):
-        if prob > prob_threshold:
-            anomalies[item] = prob
+    mask, probs = get_anomaly_mask(scores, prob_threshold)
+    anomalies = dict(zip([items[i] for i in np.nonzero(mask)[0]],
+                         probs[mask].tolist()))
     return anomalies
 
 
@@ -1,47 +1,190 @@
+import functools
 import json
+import math
 import os
-from collections import defaultdict
-from typing import Dict, Optional, Set, Union
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple,
+                    Union)
 
 import numpy as np
-import tensorflow as tf
-import tensorflow_hub as hub
-from sklearn.metrics.pairwise import cosine_similarity
-# Shall not delete even though not employed:
-from tensorflow_text import SentencepieceTokenizer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # The 16-language multilingual module is the default but feel free
 # to pick others from the list and compare the results.
 USE_MODEL_URL = 'https://tfhub.dev/google/universal-sentence-encoder-multilingual/3' #@param ['https://tfhub.dev/google/universal-sentence-encoder-multilingual/3', 'https://tfhub.dev/google/universal-sentence-encoder-multilingual-large/3']  # noqa:E501
-USE_MODEL = hub.load(USE_MODEL_URL)
+# Optionally, the path to the USE model exported to ONNX, which is then
+# served by ONNX Runtime instead of TensorFlow Hub. This saves the eager
+# dispatch overhead per call.
+USE_ONNX_PATH = os.environ.get('AVKG_USE_ONNX_PATH')
+
+
+def _load_onnx_model(path: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = os.cpu_count()
+    session = ort.InferenceSession(path, options,
+                                   providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    def model(inputs: List[str]):
+        feeds = {input_name: np.array(inputs, dtype=object)}
+        return session.run(None, feeds)[0]
+
+    return model
+
+
+_USE_MODEL = None
+_USE_MODEL_LOCK = threading.Lock()
+
+
+def _get_model():
+    """Loads the USE model on first use, so that importing this module
+    stays cheap when nothing is embedded."""
+    global _USE_MODEL
+    if _USE_MODEL is None:
+        # `embed_all` embeds batches in threads, which may race here.
+        with _USE_MODEL_LOCK:
+            if _USE_MODEL is None:
+                _USE_MODEL = _load_model()
+    return _USE_MODEL
+
+
+def _load_model():
+    if USE_ONNX_PATH:
+        return _load_onnx_model(USE_ONNX_PATH)
+    import tensorflow_hub as hub
+    # Shall not delete even though not employed:
+    from tensorflow_text import SentencepieceTokenizer
+    return hub.load(USE_MODEL_URL)
 
 
 def embed_text(input: str):
     assert isinstance(input, str)
-    vector: np.ndarray = USE_MODEL(input)[0, :]
+    vector: np.ndarray = embed_texts([input])[0]
     return vector
 
 
+def embed_texts(inputs: List[str]) -> np.ndarray:
+    vectors: np.ndarray = np.asarray(_get_model()(inputs))
+    return vectors
+
+
+def get_similarity_by_cosine(cosine: float) -> float:
+    cosine = max(-1.0, min(1.0, cosine))
+    return 1 - math.acos(cosine) / math.pi
+
+
+def get_cosine_threshold(similarity_threshold: float) -> float:
+    """The cosine above which the similarity is above the threshold."""
+    return math.cos((1 - similarity_threshold) * math.pi)
+
+
 def get_similarity(vector: np.ndarray,
                    other_vector: np.ndarray) -> float:
-    cosine = cosine_similarity(
-        tf.reshape(vector, (1, -1)),
-        tf.reshape(other_vector, (1, -1)),
-    )[0, 0]
-    if cosine > 1:
-        cosine = 1
-    elif cosine < -1:
-        cosine = -1
-    return 1 - np.arccos(cosine) / np.pi
+    vector = np.asarray(vector).ravel()
+    other_vector = np.asarray(other_vector).ravel()
+    cosine = float(vector @ other_vector)
+    cosine /= np.linalg.norm(vector) * np.linalg.norm(other_vector)
+    return get_similarity_by_cosine(cosine)
+
+
+# Texts hash by their contents, so this is keyed by the content pair. It
+# is bounded, since fuzzy search compares each new query to all entities.
+@functools.lru_cache(maxsize=2 ** 16)
+def _get_similarity_of_texts(text: 'EmbeddedText',
+                             other: 'EmbeddedText') -> float:
+    return get_similarity_by_cosine(float(np.dot(text._unit, other._unit)))
 
 
 class EmbeddedText:
+    """Texts are interned per class, so that the same content is
+    embedded only once and shares a single instance.
+    """
+
+    __slots__ = ('_content', '_vector', '_unit', '_q', '_scale', '_l1',
+                 '_hash')
 
     SIMILARITY_THRESHOLD = 0.9  # default value.
+    EMBEDDING_BATCH_SIZE = 256
 
-    def __init__(self, content: str):
-        self._content = content
-        self._vector = embed_text(self.content)
+    _pool: Dict[str, 'EmbeddedText'] = {}
+    # Shared by the subclasses, guarding the creation of texts that may
+    # happen in several threads.
+    _pool_lock = threading.Lock()
+
+    def __new__(cls, content: str):
+        return cls.get(content)
+
+    @classmethod
+    def get(cls, text: Union['EmbeddedText', str]):
+        """Returns the interned instance of the `text` if it is a string,
+        otherwise the `text` itself, which is an instance already.
+        """
+        if not isinstance(text, str):
+            return text
+        obj = cls._pool.get(text)
+        if obj is None:
+            with cls._pool_lock:
+                obj = cls._pool.get(text)
+                if obj is None:
+                    obj = cls._create(text, embed_text(text))
+        return obj
+
+    @classmethod
+    def from_vector(cls, content: str, vector: np.ndarray):
+        """Returns the text of the `content` with the pre-computed
+        `vector`, if it has not been created yet.
+        """
+        obj = cls._pool.get(content)
+        if obj is None:
+            with cls._pool_lock:
+                obj = cls._pool.get(content)
+                if obj is None:
+                    obj = cls._create(content, vector)
+        return obj
+
+    @classmethod
+    def embed_all(cls, contents: Iterable[str]):
+        """Creates the texts of all the `contents` that have not been
+        created yet, embedding them batch by batch instead of one by one.
+        """
+        new_contents = sorted(set(contents).difference(cls._pool))
+        batch_size = cls.EMBEDDING_BATCH_SIZE
+        batches = [new_contents[i:i+batch_size]
+                   for i in range(0, len(new_contents), batch_size)]
+        if len(batches) > 1:
+            # The model releases the GIL, so batches run in parallel.
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                batch_vectors = list(executor.map(embed_texts, batches))
+        else:
+            batch_vectors = [embed_texts(batch) for batch in batches]
+        for batch, vectors in zip(batches, batch_vectors):
+            for content, vector in zip(batch, vectors):
+                cls.from_vector(content, vector)
+
+    @classmethod
+    def _create(cls, content: str, vector: np.ndarray):
+        obj = super().__new__(cls)
+        obj._content = content
+        obj._vector = vector
+        unit = np.asarray(vector, dtype=np.float32)
+        obj._unit = unit / np.linalg.norm(unit)
+        # Symmetric int8 quantization of the unit vector, which is
+        # `self._q * self._scale` up to an error of `self._scale / 2`
+        # on each component.
+        obj._scale = float(np.abs(obj._unit).max()) / 127
+        obj._q = np.round(obj._unit / obj._scale).astype(np.int8)
+        obj._l1 = float(np.abs(obj._unit).sum())
+        obj._hash = hash(content)
+        cls._pool[content] = obj
+        return obj
 
     @property
     def content(self):
@@ -52,14 +195,31 @@ class EmbeddedText:
         return self._vector
 
     def is_like(self, other):
-        similarity = get_similarity(self.vector, other.vector)
+        # Ordered by content, so that both orders share the cached entry.
+        if self._content <= other._content:
+            similarity = _get_similarity_of_texts(self, other)
+        else:
+            similarity = _get_similarity_of_texts(other, self)
         return similarity > EmbeddedText.SIMILARITY_THRESHOLD
 
     def __eq__(self, other):
-        return self.content == other.content
+        # Interned texts are mostly compared by identity; the type check
+        # keeps an entity from equaling a relation of the same content,
+        # and the cached hashes reject most others before comparing the
+        # contents.
+        return self is other or (
+            type(other) is type(self) and
+            self._hash == other._hash and
+            self._content == other._content
+        )
 
     def __hash__(self):
-        return hash(self.content)
+        return self._hash
+
+    def __reduce__(self):
+        # Copying or unpickling goes back through the pool, so that the
+        # interned instance is returned.
+        return type(self).get, (self._content,)
 
     def __repr__(self):
         return f'''
@@ -74,38 +234,78 @@ class EmbeddedText:
 
 class Entity(EmbeddedText):
 
+    __slots__ = ()
+
+    _pool: Dict[str, 'Entity'] = {}
+
     def __repr__(self):
         return f'{self.content}'
 
 
 class Relation(EmbeddedText):
 
+    __slots__ = ()
+
+    _pool: Dict[str, 'Relation'] = {}
+
     def __repr__(self):
         return f'-- {self.content} -->'
 
 
 class Fact:
 
+    __slots__ = ('head', 'relation', 'tail', '_hash')
+
     def __init__(self,
                  head: Union[Entity, str],
                  relation: Union[Relation, str],
                  tail: Union[Entity, str]):
-        if isinstance(head, str):
-            head = Entity(head)
-        self.head = head
+        self.head = Entity.get(head)
+        self.relation = Relation.get(relation)
+        self.tail = Entity.get(tail)
+        self._hash = hash((self.head, self.relation, self.tail))
 
-        if isinstance(relation, str):
-            relation = Relation(relation)
-        self.relation = relation
+    def __eq__(self, other):
+        return self is other or (
+            isinstance(other, Fact) and
+            self._hash == other._hash and
+            self.head == other.head and
+            self.relation == other.relation and
+            self.tail == other.tail
+        )
 
-        if isinstance(tail, str):
-            tail = Entity(tail)
-        self.tail = tail
+    def __hash__(self):
+        return self._hash
 
     def __repr__(self):
         return f'{repr(self.head)} {repr(self.relation)} {repr(self.tail)}'
 
 
+_NO_FACTS: FrozenSet[Fact] = frozenset()
+_NO_TAILS: FrozenSet[Entity] = frozenset()
+
+# Characters are non-empty, so the empty string can mark the end of the
+# content in the trie.
+_TRIE_END = ''
+
+
+class _LazyRelation:
+    """Class attribute that creates the relation on first access, since
+    embedding it when the class is defined would load the USE model."""
+
+    def __init__(self, content: str):
+        self._content = content
+        self._relation: Optional[Relation] = None
+        self._lock = threading.Lock()
+
+    def __get__(self, obj, owner) -> Relation:
+        if self._relation is None:
+            with self._lock:
+                if self._relation is None:
+                    self._relation = Relation(self._content)
+        return self._relation
+
+
 class KnowledgeGraph:
     """The elemental data structure of knowledge graph.
 
@@ -119,16 +319,52 @@ class KnowledgeGraph:
     1. [A Survey on Knowledge Graphs: Representation, Acquisition and Applications](https://arxiv.org/abs/2002.00388v4).
     """
 
-    SUBCATEGORY_RELATION = Relation('is of')
+    # The content is a plain string, so that reading it neither creates
+    # the relation nor loads the USE model.
+    SUBCATEGORY_RELATION_CONTENT = 'is of'
+    SUBCATEGORY_RELATION = _LazyRelation(SUBCATEGORY_RELATION_CONTENT)
+    FUZZY_SEARCH_CACHE_SIZE = 4096
 
     def __init__(self):
         self._entities: Set[Entity] = set()
         self._relations: Set[Relation] = set()
         self._facts: Set[Fact] = set()
 
-        self._head_to_facts: Dict[Entity, Set[Fact]] = defaultdict(set)
-        self._relation_to_facts: Dict[Relation, Set[Fact]] = defaultdict(set)
-        self._tail_to_facts: Dict[Entity, Set[Fact]] = defaultdict(set)
+        self._head_to_facts: Dict[Entity, Set[Fact]] = {}
+        self._relation_to_facts: Dict[Relation, Set[Fact]] = {}
+        self._tail_to_facts: Dict[Entity, Set[Fact]] = {}
+
+        # Compound-key indices, so that exact search on any two fields
+        # is a single dictionary lookup.
+        self._hr_to_facts: Dict[Tuple[Entity, Relation], Set[Fact]] = {}
+        self._rt_to_facts: Dict[Tuple[Relation, Entity], Set[Fact]] = {}
+        self._ht_to_facts: Dict[Tuple[Entity, Entity], Set[Fact]] = {}
+        self._relation_head_tail: \
+            Dict[Relation, Dict[Entity, Set[Entity]]] = {}
+
+        # Facts in insertion order, aligned with the rows of the heads.
+        self._facts_list: List[Fact] = []
+        # Quantized unit vectors of the heads of `self._facts_list`, row
+        # by row, together with their scales and L1-norms. They are kept
+        # in buffers that double when full, so that adding facts appends
+        # rows instead of rebuilding the matrix.
+        self._head_q: Optional[np.ndarray] = None
+        self._head_scales = np.empty(0, dtype=np.float32)
+        self._head_l1 = np.empty(0, dtype=np.float32)
+        self._num_head_rows = 0
+
+        # Character trie of the entity contents, for prefix search. A node
+        # maps characters to child nodes, and `_TRIE_END` to the entity
+        # whose content ends at that node.
+        self._name_trie: Dict[str, Any] = {}
+
+        self._objects_cache: Dict[Entity, FrozenSet[Entity]] = {}
+        # Least recently used first, bounded by `FUZZY_SEARCH_CACHE_SIZE`.
+        self._fuzzy_search_cache: Dict[
+            Tuple[Optional[Entity], Optional[Relation], Optional[Entity],
+                  float],
+            FrozenSet[Fact],
+        ] = OrderedDict()
 
     @property
     def entities(self):
@@ -142,34 +378,177 @@ class KnowledgeGraph:
     def facts(self):
         return self._facts
 
+    # The results are copies of the index sets, so that callers cannot
+    # corrupt the indices. Copying a set is much cheaper than building
+    # one fact by fact.
+
     def get_facts_by_head(self, head: Union[Entity, str]):
-        if isinstance(head, str):
-            head = Entity(head)
-        return self._head_to_facts[head]
+        head = Entity.get(head)
+        return set(self._get_facts_by_head_fast(head))
 
     def get_facts_by_relation(self, relation: Union[Relation, str]):
-        if isinstance(relation, str):
-            relation = Relation(relation)
-        return self._relation_to_facts[relation]
+        relation = Relation.get(relation)
+        return set(self._get_facts_by_relation_fast(relation))
 
     def get_facts_by_tail(self, tail: Union[Entity, str]):
-        if isinstance(tail, str):
-            tail = Entity(tail)
-        return self._tail_to_facts[tail]
+        tail = Entity.get(tail)
+        return set(self._get_facts_by_tail_fast(tail))
+
+    # The fast versions skip the coercion and the copy, for internal
+    # callers that already have an `Entity` or `Relation` at hand.
+
+    def _get_facts_by_head_fast(self, head: Entity):
+        return self._head_to_facts.get(head, _NO_FACTS)
+
+    def _get_facts_by_relation_fast(self, relation: Relation):
+        return self._relation_to_facts.get(relation, _NO_FACTS)
+
+    def _get_facts_by_tail_fast(self, tail: Entity):
+        return self._tail_to_facts.get(tail, _NO_FACTS)
+
+    def get_tails(self,
+                  head: Union[Entity, str],
+                  relation: Union[Relation, str]):
+        head = Entity.get(head)
+        relation = Relation.get(relation)
+        head_to_tails = self._relation_head_tail.get(relation)
+        if head_to_tails is None:
+            return _NO_TAILS
+        tails = head_to_tails.get(head)
+        # A frozen copy, so that callers cannot corrupt the index.
+        return _NO_TAILS if tails is None else frozenset(tails)
 
     def add(self, fact: Fact):
-        self._entities.add(fact.head)
-        self._relations.add(fact.relation)
-        self._entities.add(fact.tail)
-        self._facts.add(fact)
+        if fact in self._facts:
+            return
+        self.add_many((fact,))
+
+    def add_many(self, facts: Iterable[Fact]):
+        # Bind the containers locally, since this is the hot loop when
+        # loading data.
+        entities = self._entities
+        relations = self._relations
+        all_facts = self._facts
+        h2f = self._head_to_facts
+        r2f = self._relation_to_facts
+        t2f = self._tail_to_facts
+        hr2f = self._hr_to_facts
+        rt2f = self._rt_to_facts
+        ht2f = self._ht_to_facts
+        rht = self._relation_head_tail
+        facts_list = self._facts_list
+        subcategory_relation = KnowledgeGraph.SUBCATEGORY_RELATION
+
+        new_heads: List[Entity] = []
+        has_subcategory = False
+        for fact in facts:
+            if fact in all_facts:
+                continue
+            head, relation, tail = fact.head, fact.relation, fact.tail
+            facts_list.append(fact)
+            new_heads.append(head)
+            if head not in entities:
+                entities.add(head)
+                self._insert_into_trie(head)
+            relations.add(relation)
+            if tail not in entities:
+                entities.add(tail)
+                self._insert_into_trie(tail)
+            all_facts.add(fact)
+
+            h2f.setdefault(head, set()).add(fact)
+            r2f.setdefault(relation, set()).add(fact)
+            t2f.setdefault(tail, set()).add(fact)
+
+            hr2f.setdefault((head, relation), set()).add(fact)
+            rt2f.setdefault((relation, tail), set()).add(fact)
+            ht2f.setdefault((head, tail), set()).add(fact)
+            rht.setdefault(relation, {}).setdefault(head, set()).add(tail)
+
+            if relation == subcategory_relation:
+                has_subcategory = True
+
+        # Nothing new, so the derived indices and caches are still valid.
+        if not new_heads:
+            return
+        self._append_head_rows(new_heads)
+        self._fuzzy_search_cache.clear()
+        if has_subcategory:
+            self._objects_cache.clear()
+
+    def _insert_into_trie(self, entity: Entity):
+        node = self._name_trie
+        for char in entity.content:
+            node = node.setdefault(char, {})
+        node[_TRIE_END] = entity
+
+    def search_prefix(self, prefix: str) -> Set[Entity]:
+        """Returns the entities whose contents start with the `prefix`."""
+        node = self._name_trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+
+        results: Set[Entity] = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == _TRIE_END:
+                    results.add(child)
+                else:
+                    stack.append(child)
+        return results
 
-        self._head_to_facts[fact.head].add(fact)
-        self._relation_to_facts[fact.relation].add(fact)
-        self._tail_to_facts[fact.tail].add(fact)
+    def _append_head_rows(self, heads: List[Entity]):
+        if not heads:
+            return
+        begin = self._num_head_rows
+        end = begin + len(heads)
+        if self._head_q is None or end > self._head_q.shape[0]:
+            capacity = max(end, 2 * self._head_scales.shape[0])
+            head_q = np.empty((capacity, heads[0]._q.shape[0]), dtype=np.int8)
+            head_scales = np.empty(capacity, dtype=np.float32)
+            head_l1 = np.empty(capacity, dtype=np.float32)
+            if self._head_q is not None:
+                head_q[:begin] = self._head_q[:begin]
+                head_scales[:begin] = self._head_scales[:begin]
+                head_l1[:begin] = self._head_l1[:begin]
+            self._head_q = head_q
+            self._head_scales = head_scales
+            self._head_l1 = head_l1
+
+        self._head_q[begin:end] = np.stack([head._q for head in heads])
+        self._head_scales[begin:end] = [head._scale for head in heads]
+        self._head_l1[begin:end] = [head._l1 for head in heads]
+        self._num_head_rows = end
+
+    def _get_head_matrix(self):
+        n = self._num_head_rows
+        return self._head_q[:n], self._head_scales[:n], self._head_l1[:n]
+
+    def find_heads(self,
+                   relation: Union[Relation, str],
+                   tails: Iterable[Union[Entity, str]],
+                   heads: Optional[Iterable[Union[Entity, str]]] = None
+                   ) -> Set[Entity]:
+        """Returns the heads of the facts with the `relation` and a tail
+        in `tails`, and, if `heads` is given, a head in `heads`.
+        """
+        relation = Relation.get(relation)
+        if heads is not None:
+            heads = {Entity.get(head) for head in heads}
+        rt2f = self._rt_to_facts
+        results: Set[Entity] = set()
+        for tail in tails:
+            for fact in rt2f.get((relation, Entity.get(tail)), _NO_FACTS):
+                if heads is None or fact.head in heads:
+                    results.add(fact.head)
+        return results
 
     def __iadd__(self, other):
-        for fact in other.facts:
-            self.add(fact)
+        self.add_many(other.facts)
         return self
 
     def exact_search(self,
@@ -178,78 +557,197 @@ class KnowledgeGraph:
                      tail: Optional[Entity] = None):
         """Comparing with fuzzy search, exact search is much faster,
         especially when there's lots of facts.
-        """
-        results: Set[Fact] = set()
-        if head:
-            results = self.get_facts_by_head(head)
-
-        if relation and not results:
-            results = self.get_facts_by_relation(relation)
-        elif relation and results:
-            results = results.intersection(self.get_facts_by_relation(relation))
-
-        if tail and not results:
-            results = self.get_facts_by_tail(tail)
-        elif tail and results:
-            results = results.intersection(self.get_facts_by_tail(tail))
 
-        return results
+        The most specific index for the given fields is looked up. With
+        all three fields, the pair indices are intersected starting from
+        the smallest one.
+        """
+        head = Entity.get(head)
+        relation = Relation.get(relation)
+        tail = Entity.get(tail)
+
+        if head is not None and relation is not None and tail is not None:
+            postings = sorted([
+                self._hr_to_facts.get((head, relation), _NO_FACTS),
+                self._rt_to_facts.get((relation, tail), _NO_FACTS),
+                self._ht_to_facts.get((head, tail), _NO_FACTS),
+            ], key=len)
+            return set(postings[0]).intersection(*postings[1:])
+
+        # Otherwise, a single index holds the results.
+        if head is not None and relation is not None:
+            facts = self._hr_to_facts.get((head, relation), _NO_FACTS)
+        elif relation is not None and tail is not None:
+            facts = self._rt_to_facts.get((relation, tail), _NO_FACTS)
+        elif head is not None and tail is not None:
+            facts = self._ht_to_facts.get((head, tail), _NO_FACTS)
+        elif head is not None:
+            facts = self._head_to_facts.get(head, _NO_FACTS)
+        elif relation is not None:
+            facts = self._relation_to_facts.get(relation, _NO_FACTS)
+        elif tail is not None:
+            facts = self._tail_to_facts.get(tail, _NO_FACTS)
+        else:
+            facts = _NO_FACTS
+        return set(facts)
 
     def fuzzy_search(self,
                      head: Optional[Entity] = None,
                      relation: Optional[Relation] = None,
                      tail: Optional[Entity] = None):
+        head = Entity.get(head)
+        relation = Relation.get(relation)
+        tail = Entity.get(tail)
+        # The threshold is a part of the key, since it can be changed.
+        key = (head, relation, tail, EmbeddedText.SIMILARITY_THRESHOLD)
+        cached = self._fuzzy_search_cache.get(key)
+        if cached is not None:
+            self._fuzzy_search_cache.move_to_end(key)
+            # A copy, so that callers may mutate it like `exact_search`'s.
+            return set(cached)
+
+        # Relations and tails are compared once per distinct text instead
+        # of once per fact.
+        like_relations = (None if relation is None else
+                          _get_like(self._relations, relation))
+        like_tails = None if tail is None else _get_like(self._entities, tail)
+
+        # Heads are pre-filtered by one int8 matrix-vector product for all
+        # facts, then confirmed by the exact similarity. The bound of the
+        # quantization error is subtracted, so that no match is missed.
+        if head is not None and self._facts_list:
+            # Imported here, since it pulls in numba, which is slow to
+            # import and only needed by fuzzy search on heads.
+            from utils import get_quantized_like_mask
+
+            h_q, h_scales, h_l1 = self._get_head_matrix()
+            threshold = get_cosine_threshold(EmbeddedText.SIMILARITY_THRESHOLD)
+            mask = get_quantized_like_mask(h_q, h_scales, h_l1,
+                                           head._q, head._scale, head._l1,
+                                           threshold)
+            indices = np.nonzero(mask)[0]
+            candidates = [
+                self._facts_list[i] for i in indices
+                if self._facts_list[i].head is head or
+                self._facts_list[i].head.is_like(head)
+            ]
+        elif head is None and (like_relations is not None or
+                               like_tails is not None):
+            # Otherwise, start from the postings of the more selective one
+            # of the relation and tail.
+            postings = []
+            if like_relations is not None:
+                postings.append([self._relation_to_facts[r]
+                                 for r in like_relations])
+            if like_tails is not None:
+                postings.append([self._tail_to_facts[t]
+                                 for t in like_tails
+                                 if t in self._tail_to_facts])
+            seed = min(postings, key=lambda ps: sum(len(p) for p in ps))
+            candidates = [fact for p in seed for fact in p]
+        else:
+            candidates = self._facts_list
+
         results: Set[Fact] = set()
-        for fact in self.facts:
-            if head and not fact.head.is_like(head):
+        for fact in candidates:
+            if like_relations is not None and \
+                    fact.relation not in like_relations:
                 continue
-            if relation and not fact.relation.is_like(relation):
-                continue
-            if tail and not fact.tail.is_like(tail):
+            if like_tails is not None and fact.tail not in like_tails:
                 continue
             results.add(fact)
+        self._fuzzy_search_cache[key] = frozenset(results)
+        if len(self._fuzzy_search_cache) > self.FUZZY_SEARCH_CACHE_SIZE:
+            self._fuzzy_search_cache.popitem(last=False)
         return results
 
     def get_objects(self, category: Union[Entity, str]):
-        if isinstance(category, str):
-            category = Entity(category)
-
+        category = Entity.get(category)
+        if category in self._objects_cache:
+            return self._objects_cache[category]
+
+        # Depth-first walk down the subcategories, collecting the leaves.
+        # Each category is visited once, even if shared by many parents.
+        subcategory_relation = KnowledgeGraph.SUBCATEGORY_RELATION
+        rt2f = self._rt_to_facts
         objects: Set[Entity] = set()
-        for fact in self.get_facts_by_tail(category):
-            if fact.relation == KnowledgeGraph.SUBCATEGORY_RELATION:
-                objects.update(self.get_objects(fact.head))
-        if not objects:
-            return set([category])
-        return objects
+        visited: Set[Entity] = {category}
+        stack = [category]
+        while stack:
+            node = stack.pop()
+            facts = rt2f.get((subcategory_relation, node))
+            if not facts:
+                objects.add(node)
+                continue
+            for fact in facts:
+                if fact.head not in visited:
+                    visited.add(fact.head)
+                    stack.append(fact.head)
+        self._objects_cache[category] = frozenset(objects)
+        return self._objects_cache[category]
 
     @staticmethod
     def load_data(data_dir_path: str):
-        return _load_data_recur(data_dir_path, None)
+        kg = KnowledgeGraph()
+        _add_triplets(kg, _read_data_dir(data_dir_path))
+        return kg
 
 
-def _load_data_recur(data_dir_path: str,
-                     kg: Optional[KnowledgeGraph]):
-    if kg is None:
-        kg = KnowledgeGraph()
-        category = None
-    else:
-        _, category = os.path.split(data_dir_path)
+Triplet = Tuple[str, str, str]
+
+
+def _get_like(texts: Iterable[EmbeddedText],
+              query: EmbeddedText) -> Set[EmbeddedText]:
+    # Identical texts are like each other without computing similarity.
+    return {text for text in texts if text is query or text.is_like(query)}
 
-    for filename in os.listdir(data_dir_path):
-        file_path = os.path.join(data_dir_path, filename)
 
-        if os.path.isdir(file_path):
-            kg = _load_data_recur(file_path, kg)
+def _read_data_dir(data_dir_path: str) -> List[Triplet]:
+    triplets: List[Triplet] = []
+    data_files: List[Tuple[str, str]] = []
+    _read_data_recur(data_dir_path, None, triplets, data_files)
+
+    # Reading and parsing the files is I/O bound, thus done in threads.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for file_triplets in executor.map(lambda args: _read_data(*args),
+                                          data_files):
+            triplets += file_triplets
+    return triplets
+
+
+def _read_data_recur(data_dir_path: str,
+                     category: Optional[str],
+                     triplets: List[Triplet],
+                     data_files: List[Tuple[str, str]]):
+    """Collects the subcategory triplets of the tree into `triplets`, and
+    the paths of the JSON files, together with their categories, into
+    `data_files`.
+    """
+    with os.scandir(data_dir_path) as entries:
+        entries = list(entries)
+    for entry in entries:
+        filename, file_path = entry.name, entry.path
+
+        # `DirEntry` caches the file type, saving a `stat` call per file.
+        if entry.is_dir():
+            _read_data_recur(file_path, filename, triplets, data_files)
 
         else:
             subcategory, ext = os.path.splitext(filename)
             assert ext == '.json'
             if category is not None:
-                kg.add(Fact(subcategory,
-                            KnowledgeGraph.SUBCATEGORY_RELATION,
-                            category))
-            update_knowledge_graph(kg, file_path, subcategory)
-    return kg
+                triplets.append((subcategory,
+                                 KnowledgeGraph.SUBCATEGORY_RELATION_CONTENT,
+                                 category))
+            data_files.append((file_path, subcategory))
+
+
+def _add_triplets(kg: KnowledgeGraph, triplets: List[Triplet]):
+    # Embed all texts in batch before creating the facts, which then
+    # find their `Entity`s and `Relation`s already interned.
+    Entity.embed_all([h for h, _, _ in triplets] + [t for _, _, t in triplets])
+    Relation.embed_all([r for _, r, _ in triplets])
+    kg.add_many(Fact(h, r, t) for h, r, t in triplets)
 
 
 def update_knowledge_graph(kg: KnowledgeGraph,
@@ -285,12 +783,25 @@ def update_knowledge_graph(kg: KnowledgeGraph,
 
     kg: The base knowledge graph, on which new data are added.
     """
-    with open(data_path, 'r') as f:
-        heads = json.load(f)
+    _add_triplets(kg, _read_data(data_path, category))
+
+
+def _read_data(data_path: str, category: str = None) -> List[Triplet]:
+    if orjson is not None:
+        with open(data_path, 'rb') as f:
+            heads = orjson.loads(f.read())
+    else:
+        with open(data_path, 'r') as f:
+            heads = json.load(f)
 
+    subcategory_relation = KnowledgeGraph.SUBCATEGORY_RELATION_CONTENT
+    triplets: List[Triplet] = []
     for head, relations in heads.items():
-        kg.add(Fact(head, KnowledgeGraph.SUBCATEGORY_RELATION, category))
+        # Without a category, the heads are not filed under any.
+        if category is not None:
+            triplets.append((head, subcategory_relation, category))
         for relation, tails in relations.items():
             tails = [tails] if isinstance(tails, str) else tails
             for tail in tails:
-                kg.add(Fact(head, relation, tail))
+                triplets.append((head, relation, tail))
+    return triplets
@@ -1,18 +1,134 @@
 import math
-from typing import List
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+_NUMBA_AVAILABLE = numba is not None
 
 
 def intersect(*args: set):
-    arg0, *rest_args = args
-    if not rest_args:
-        return arg0
-    return arg0.intersection(intersect(*rest_args))
+    if not args:
+        return set()
+    # Seeding with the smallest set keeps the intersection small.
+    ordered = sorted(args, key=len)
+    result = set(ordered[0])
+    for arg in ordered[1:]:
+        if not result:
+            break
+        result.intersection_update(arg)
+    return result
+
+
+def softmax(xs: Sequence[float]) -> List[float]:
+    # A single vectorized `exp` is as fast as the compiled loop here.
+    return _softmax_py(np.asarray(xs, dtype=np.float64)).tolist()
+
+
+def get_anomaly_mask(scores: np.ndarray,
+                     prob_threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the mask of the anomalous scores, together with the
+    probabilities, i.e. the softmax of the logarithm of the scores.
+    """
+    return _get_anomaly_mask(np.asarray(scores, dtype=np.float64),
+                             prob_threshold)
+
+
+def warm_up_anomaly_mask():
+    """Compiles the kernel of `get_anomaly_mask` ahead of its first call.
+    This is not done on import, since not every importer diagnoses.
+    """
+    _get_anomaly_mask(np.ones(1), 0.5)
+
+
+def get_quantized_like_mask(h_q: np.ndarray,
+                            h_scales: np.ndarray,
+                            h_l1: np.ndarray,
+                            q: np.ndarray,
+                            q_scale: float,
+                            q_l1: float,
+                            cosine_threshold: float) -> np.ndarray:
+    """Returns the mask of the rows of the int8 matrix `h_q` whose
+    cosine with the int8 vector `q` may be above the `cosine_threshold`.
+
+    The cosine is recovered by the scales, and the upper bound of the
+    quantization error, estimated by the L1-norms, is subtracted from
+    the threshold. So, no row above the threshold will be missed.
+    """
+    return _get_quantized_like_mask(h_q, h_scales, h_l1,
+                                    q, q_scale, q_l1, cosine_threshold)
+
+
+def _softmax_py(x: np.ndarray):
+    x = x - x.max()
+    np.exp(x, out=x)
+    x /= x.sum()
+    return x
+
+
+def _get_anomaly_mask_py(scores: np.ndarray, prob_threshold: float):
+    probs = _softmax_py(np.log(scores + 1e-1))
+    return probs > prob_threshold, probs
+
+
+def _get_quantized_like_mask_py(h_q, h_scales, h_l1,
+                                q, q_scale, q_l1, cosine_threshold):
+    cosines = np.einsum('ij,j->i', h_q, q, dtype=np.int32)
+    cosines = cosines * (h_scales * q_scale)
+    errors = (0.5 * (h_scales * q_l1 + q_scale * h_l1) +
+              0.25 * h_q.shape[1] * h_scales * q_scale)
+    return cosines > cosine_threshold - errors
+
+
+if _NUMBA_AVAILABLE:
+
+    @numba.njit(cache=True, fastmath=True)
+    def _softmax_nb(x):
+        x_max = x[0]
+        for i in range(1, x.shape[0]):
+            if x[i] > x_max:
+                x_max = x[i]
+        out = np.empty_like(x)
+        denom = 0.0
+        for i in range(x.shape[0]):
+            out[i] = math.exp(x[i] - x_max)
+            denom += out[i]
+        for i in range(x.shape[0]):
+            out[i] /= denom
+        return out
+
+    @numba.njit(cache=True, fastmath=True)
+    def _get_anomaly_mask_nb(scores, prob_threshold):
+        log_scores = np.empty_like(scores)
+        for i in range(scores.shape[0]):
+            log_scores[i] = math.log(scores[i] + 1e-1)
+        probs = _softmax_nb(log_scores)
+        return probs > prob_threshold, probs
 
+    # Compiled on the first call instead of on import, since fuzzy search
+    # is not employed by every session.
+    @numba.njit(cache=True, fastmath=True, parallel=True)
+    def _get_quantized_like_mask_nb(h_q, h_scales, h_l1,
+                                    q, q_scale, q_l1, cosine_threshold):
+        n, d = h_q.shape
+        mask = np.empty(n, dtype=np.bool_)
+        for i in numba.prange(n):
+            acc = 0
+            for j in range(d):
+                acc += np.int32(h_q[i, j]) * np.int32(q[j])
+            scale = h_scales[i] * q_scale
+            error = (0.5 * (h_scales[i] * q_l1 + q_scale * h_l1[i]) +
+                     0.25 * d * scale)
+            mask[i] = acc * scale > cosine_threshold - error
+        return mask
 
-def softmax(xs: List[float]):
-    x_max = max(xs)
-    xs = [x - x_max for x in xs]
-    exp_xs = [math.exp(x) for x in xs]
-    denom = sum(exp_xs)
-    return [exp_x / denom for exp_x in exp_xs]
+    _get_anomaly_mask = _get_anomaly_mask_nb
+    _get_quantized_like_mask = _get_quantized_like_mask_nb
 
+else:
+    _get_anomaly_mask = _get_anomaly_mask_py
+    _get_quantized_like_mask = _get_quantized_like_mask_py